@@ -1,13 +1,26 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 from kanban import views
 from kanban.config import get_config
+from kanban.database import SessionMiddleware
 from kanban.extensions import login
+from kanban.models import create_tables
+from kanban.security import shutdown_hash_pool
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await create_tables()
+    yield
+    shutdown_hash_pool()
 
 
 def create_app():
-    app = FastAPI()
+    app = FastAPI(lifespan=lifespan)
     app.secret_key = get_config()['SECRET_KEY']
+    app.add_middleware(SessionMiddleware)
     login.init_app(app)
     views.init_app(app)
     return app
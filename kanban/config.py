@@ -1,8 +1,10 @@
+from functools import lru_cache
 from pathlib import Path
 
 import toml
 
 
+@lru_cache(maxsize=1)
 def get_config():
-    config = toml.load(open(Path('.config.toml').absolute()))
+    config = toml.load(Path('.config.toml').absolute())
     return config
@@ -1,7 +1,48 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from contextvars import ContextVar
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
 from kanban.config import get_config
 
-db = create_engine(get_config()['DATABASE_URI'])
-Session = sessionmaker(db)
\ No newline at end of file
+connect_args = {}
+if get_config().get('PGBOUNCER', False):
+    connect_args = {
+        'statement_cache_size': 0,
+        'prepared_statement_cache_size': 0,
+        'prepared_statement_name_func': lambda: f'__asyncpg_{uuid4()}__',
+    }
+
+db = create_async_engine(
+    get_config()['DATABASE_URI'],
+    pool_size=20,
+    max_overflow=10,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    connect_args=connect_args,
+)
+Session = async_sessionmaker(db, expire_on_commit=False)
+session_context: ContextVar[AsyncSession] = ContextVar('session')
+
+
+class SessionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        async with Session() as session:
+            token = session_context.set(session)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                session_context.reset(token)
+
+
+async def get_session():
+    return session_context.get()
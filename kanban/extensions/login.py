@@ -1,14 +1,48 @@
+from cachetools import TTLCache
+from fastapi import Depends
+from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_login import LoginManager
+from fastapi_login.exceptions import InvalidCredentialsException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from kanban.database import Session
+from kanban.database import get_session
 from kanban.models import User
-from kanban.config import get_config
+from kanban.security import check_password
+
+USER_CACHE = TTLCache(maxsize=10_000, ttl=30)
 
 
 def init_app(app):
-    login_manager = LoginManager(app.secret_key, token_url= get_config()['SECRET_KEY'])
+    login_manager = LoginManager(app.secret_key, token_url='/auth/token')
+
+    @login_manager.user_loader()
+    async def load_user(user_id):
+        if user_id not in USER_CACHE:
+            session = await get_session()
+            query = select(User.id).where(User.id == user_id)
+            user = (await session.execute(query)).first()
+            await session.commit()
+            if user is None:
+                return None
+            USER_CACHE[user_id] = True
+        return user_id
+
+    @app.post('/auth/token')
+    async def login(
+        data: OAuth2PasswordRequestForm = Depends(),
+        session: AsyncSession = Depends(get_session),
+    ):
+        query = select(User.id, User.password).where(
+            User.email == data.username
+        )
+        user = (await session.execute(query)).first()
+        await session.commit()
+        if user is None or not await check_password(
+            data.password, user.password
+        ):
+            raise InvalidCredentialsException
+        access_token = login_manager.create_access_token(data={'sub': user.id})
+        return {'access_token': access_token, 'token_type': 'bearer'}
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        with Session() as session:
-            return session.get(User, int(user_id))
+    app.state.login_manager = login_manager
@@ -1,31 +1,37 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, func, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 from kanban.database import db
 
 
-class Base(DeclarativeBase):
-    pass
+class Base(AsyncAttrs, DeclarativeBase):
+    __mapper_args__ = {'eager_defaults': True}
 
 
 class User(Base):
     __tablename__ = 'users'
-    id: Mapped[str] = mapped_column(primary_key=True)
+    id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False),
+        primary_key=True,
+        server_default=text('gen_random_uuid()'),
+    )
     name: Mapped[str]
     password: Mapped[str]
-    email: Mapped[str]
+    email: Mapped[str] = mapped_column(unique=True)
     photo: Mapped[Optional[str]]
     create_at: Mapped[Optional[datetime]] = mapped_column(
-        default=datetime.now()
+        server_default=func.now()
     )
     update_at: Mapped[Optional[datetime]] = mapped_column(
-        default=datetime.now()
+        server_default=func.now(), onupdate=func.now()
     )
     cards: Mapped[List['Card']] = relationship(
-        back_populates='user', cascade='all, delete-orphan'
+        back_populates='user', cascade='all, delete-orphan', lazy='selectin'
     )
     cards_categories: Mapped[List['CardCategory']] = relationship(
         back_populates='user', cascade='all, delete-orphan'
@@ -61,19 +67,27 @@ class User(Base):
 
 class Card(Base):
     __tablename__ = 'cards'
-    id: Mapped[str] = mapped_column(primary_key=True)
+    id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False),
+        primary_key=True,
+        server_default=text('gen_random_uuid()'),
+    )
     status: Mapped[str]
     title: Mapped[str]
     description: Mapped[Optional[str]]
     create_at: Mapped[Optional[datetime]] = mapped_column(
-        default=datetime.now()
+        server_default=func.now()
     )
     update_at: Mapped[Optional[datetime]] = mapped_column(
-        default=datetime.now()
+        server_default=func.now(), onupdate=func.now()
+    )
+    user_id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), ForeignKey('users.id')
     )
-    user_id: Mapped[str] = mapped_column(ForeignKey('users.id'))
     user: Mapped['User'] = relationship(back_populates='cards')
-    category_id: Mapped[int] = mapped_column(ForeignKey('cards_categories.id'))
+    category_id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), ForeignKey('cards_categories.id')
+    )
     category: Mapped['CardCategory'] = relationship(back_populates='card')
 
     def to_dict(self):
@@ -91,19 +105,27 @@ class Card(Base):
 
 class CardCategory(Base):
     __tablename__ = 'cards_categories'
-    id: Mapped[str] = mapped_column(primary_key=True)
+    id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False),
+        primary_key=True,
+        server_default=text('gen_random_uuid()'),
+    )
     name: Mapped[str]
     color: Mapped[str]
     create_at: Mapped[Optional[datetime]] = mapped_column(
-        default=datetime.now()
+        server_default=func.now()
     )
     update_at: Mapped[Optional[datetime]] = mapped_column(
-        default=datetime.now()
+        server_default=func.now(), onupdate=func.now()
     )
     card: Mapped['Card'] = relationship(
-        back_populates='category', cascade='all, delete-orphan'
+        back_populates='category',
+        cascade='all, delete-orphan',
+        lazy='selectin',
+    )
+    user_id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), ForeignKey('users.id')
     )
-    user_id: Mapped[str] = mapped_column(ForeignKey('users.id'))
     user: Mapped['User'] = relationship(back_populates='cards_categories')
 
     def to_dict(self):
@@ -121,4 +143,6 @@ class CardCategory(Base):
         }
 
 
-Base.metadata.create_all(db)
+async def create_tables():
+    async with db.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
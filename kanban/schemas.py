@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel, EmailStr
+
+
+@dataclass(slots=True)
+class CardOut:
+    id: str
+    status: str
+    title: str
+    description: Optional[str]
+    create_at: datetime
+    update_at: datetime
+    user_id: str
+    category_id: str
+
+
+@dataclass(slots=True)
+class CardCategoryOut:
+    id: str
+    name: str
+    color: str
+    create_at: datetime
+    update_at: datetime
+    card_id: Optional[str]
+
+
+class UserIn(BaseModel):
+    name: str
+    email: EmailStr
+    password: str
+    photo: Optional[str] = None
+
+
+class CardIn(BaseModel):
+    title: str
+    category_id: UUID
+    status: str
+    description: Optional[str] = None
+
+
+class CardUpdateIn(CardIn):
+    id: UUID
+
+
+class CardDeleteIn(BaseModel):
+    id: UUID
+
+
+class CardCategoryIn(BaseModel):
+    name: str
+    color: str
+
+
+class CardCategoryUpdateIn(CardCategoryIn):
+    category_id: UUID
+
+
+class CardCategoryDeleteIn(BaseModel):
+    category_id: UUID
@@ -0,0 +1,50 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from bcrypt import checkpw, gensalt, hashpw
+
+from kanban.config import get_config
+
+BCRYPT_ROUNDS = get_config().get('BCRYPT_ROUNDS', 8)
+_hash_pool = None
+
+
+def get_hash_pool():
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _hash_pool
+
+
+def shutdown_hash_pool():
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown()
+        _hash_pool = None
+
+
+def _hash_password(password, rounds):
+    return hashpw(password.encode('utf-8'), gensalt(rounds)).decode('utf-8')
+
+
+def _check_password(password, hashed):
+    return checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+async def hash_password(password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_hash_pool(), _hash_password, password, BCRYPT_ROUNDS
+    )
+
+
+async def check_password(password, hashed):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_hash_pool(), _check_password, password, hashed
+    )
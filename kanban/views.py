@@ -1,259 +1,330 @@
-from datetime import datetime
-from functools import wraps
-from uuid import uuid4
+from uuid import UUID
 
-from fastapi import Request, HTTPException
-from fastapi.responses import JSONResponse
-from sqlalchemy import select
+import orjson
+from fastapi import Depends, responses
+from fastapi.responses import StreamingResponse
+from sqlalchemy import bindparam, delete, lambda_stmt, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from kanban.database import Session
+from kanban.database import get_session
+from kanban.extensions.login import USER_CACHE
 from kanban.models import Card, CardCategory, User
+from kanban.schemas import (
+    CardCategoryDeleteIn,
+    CardCategoryIn,
+    CardCategoryOut,
+    CardCategoryUpdateIn,
+    CardDeleteIn,
+    CardIn,
+    CardOut,
+    CardUpdateIn,
+    UserIn,
+)
+from kanban.security import hash_password
 
-from bcrypt import gensalt, hashpw
+USER_BY_ID = lambda_stmt(
+    lambda: select(User).where(User.id == bindparam('user_id'))
+)
 
-def required_fields(*fields):
-    def decorator(function):
-        @wraps(function)
-        async def inner(request: Request, *args, **kwargs):
-            body = await request.json()
-            for field in fields:
-                if body.get(field) is None:
-                    raise HTTPException(status_code=400, detail=f'required field "{field}"')
-            return await function(request, *args, **kwargs)
-        return inner
-    return decorator
 
+class JSONResponse(responses.JSONResponse):
+    def render(self, content):
+        return orjson.dumps(content)
 
-def token_required(function):
-    @wraps(function)
-    async def decorator(request: Request, *args, **kwargs):
-        with Session() as session:
-            body = await request.json()
-            if body.get('user_id') is None:
-                raise HTTPException(status_code=400, detail='required field "user_id"')
-            query = select(User).where(User.id == body['user_id'])
-            user = session.scalars(query).first()
-            if user is None:
-                raise HTTPException(status_code=400, detail='invalid user_id')
-            return await function(request, *args, **kwargs)
-    return decorator
+
+async def owns_category(session, category_id, user_id):
+    query = select(CardCategory.id).where(
+        CardCategory.id == category_id, CardCategory.user_id == user_id
+    )
+    return (await session.execute(query)).first() is not None
+
+
+async def iter_json_array(result, schema):
+    yield b'['
+    separator = b''
+    async for rows in result.partitions():
+        yield separator + orjson.dumps([schema(*row) for row in rows])[1:-1]
+        separator = b','
+    yield b']'
+
+
+async def rows_response(session, query, schema):
+    result = await session.stream(query.execution_options(yield_per=100))
+    return StreamingResponse(
+        iter_json_array(result, schema), media_type='application/json'
+    )
 
 
 def init_app(app):
+    login_manager = app.state.login_manager
+
     @app.get('/user')
-    @token_required
-    async def get_user(request: Request):
-        with Session() as session:
-            body = await request.json()
-            query = select(User).where(User.id == body['user_id'])
-            user = session.scalars(query).first()
-            return JSONResponse(user.to_dict())
+    async def get_user(
+        session: AsyncSession = Depends(get_session),
+        user_id: str = Depends(login_manager),
+    ):
+        result = await session.execute(USER_BY_ID, {'user_id': user_id})
+        user = result.scalar_one_or_none()
+        if user is None:
+            return JSONResponse({'error': 'user not found'}, status_code=404)
+        return JSONResponse(user.to_dict())
 
     @app.post('/user')
-    @required_fields('name', 'email', 'password')
-    async def create_user(request: Request):
-        with Session() as session:
-            body = await request.json()
-            salt = gensalt(8)
-            password = hashpw(body['password'].encode('utf-8'), salt).decode('utf-8')
-            user_uuid = str(uuid4())
-            user = User(
-                id=user_uuid,
-                name=body['name'],
-                email=body['email'],
-                password=str(password),
-                photo=body.get('photo'),
+    async def create_user(
+        payload: UserIn, session: AsyncSession = Depends(get_session)
+    ):
+        password = await hash_password(payload.password)
+        query = (
+            insert(User)
+            .values(
+                name=payload.name,
+                email=payload.email,
+                password=password,
+                photo=payload.photo,
             )
-            session.add(user)
-            session.commit()
-            session.flush()
-            return JSONResponse(user.to_dict())
+            .on_conflict_do_nothing(index_elements=['email'])
+            .returning(*User.__table__.columns)
+        )
+        user = (await session.execute(query)).first()
+        if user is None:
+            return JSONResponse(
+                {'error': 'email already registered'}, status_code=409
+            )
+        await session.commit()
+        return JSONResponse({**user._asdict(), 'cards': []})
 
     @app.put('/user')
-    @token_required
-    @required_fields('name', 'password', 'email')
-    async def update_user(request: Request):
-        with Session() as session:
-            body = await request.json()
-            query = select(User).where(User.id == body['user_id'])
-            user = session.scalars(query).first()
-            salt = gensalt(8)
-            password = hashpw(body['password'].encode('utf-8'), salt).decode('utf-8')
-            user.name = body['name']
-            user.password = password
-            user.email = body['email']
-            user.photo = body.get('photo')
-            user.update_at = datetime.now()
-            session.commit()
-            session.flush()
-            return JSONResponse(user.to_dict())
+    async def update_user(
+        payload: UserIn,
+        session: AsyncSession = Depends(get_session),
+        user_id: str = Depends(login_manager),
+    ):
+        password = await hash_password(payload.password)
+        query = (
+            update(User)
+            .where(User.id == user_id)
+            .values(
+                name=payload.name,
+                password=password,
+                email=payload.email,
+                photo=payload.photo,
+            )
+            .returning(User)
+        )
+        try:
+            user = (await session.execute(query)).scalar_one_or_none()
+        except IntegrityError:
+            await session.rollback()
+            return JSONResponse(
+                {'error': 'email already registered'}, status_code=409
+            )
+        if user is None:
+            return JSONResponse({'error': 'user not found'}, status_code=404)
+        await user.awaitable_attrs.cards
+        await session.commit()
+        return JSONResponse(user.to_dict())
 
     @app.delete('/user')
-    @token_required
-    async def delete_user(request: Request):
-        with Session() as session:
-            body = await request.json()
-            query = select(User).where(User.id == body['user_id'])
-            user = session.scalars(query).first()
-            session.delete(user)
-            session.commit()
-            session.flush()
-            return JSONResponse(user.to_dict())
+    async def delete_user(
+        session: AsyncSession = Depends(get_session),
+        user_id: str = Depends(login_manager),
+    ):
+        result = await session.execute(USER_BY_ID, {'user_id': user_id})
+        user = result.scalar_one_or_none()
+        if user is None:
+            return JSONResponse({'error': 'user not found'}, status_code=404)
+        await session.delete(user)
+        await session.commit()
+        USER_CACHE.pop(user_id, None)
+        return JSONResponse(user.to_dict())
 
     @app.get('/card')
-    @token_required
-    async def get_cards(request: Request):
-        with Session() as session:
-            body = await request.json()
-            query = select(User).where(User.id == body['user_id'])
-            user = session.scalars(query).first()
-            query = select(Card).where(Card.user_id == user.id)
-            cards = [card.to_dict() for card in session.scalars(query).all()]
-            return JSONResponse(cards)
+    async def get_cards(
+        session: AsyncSession = Depends(get_session),
+        user_id: str = Depends(login_manager),
+    ):
+        query = select(
+            Card.id,
+            Card.status,
+            Card.title,
+            Card.description,
+            Card.create_at,
+            Card.update_at,
+            Card.user_id,
+            Card.category_id,
+        ).where(Card.user_id == user_id)
+        return await rows_response(session, query, CardOut)
 
     @app.get('/card/{card_id}')
-    @token_required
-    async def get_card(request: Request, card_id: str):
-        with Session() as session:
-            body = await request.json()
-            query = select(User).where(User.id == body['user_id'])
-            user = session.scalars(query).first()
-            card = session.get(Card, card_id)
-            if card and card.user_id == user.id:
-                return JSONResponse(card.to_dict())
-            else:
-                return JSONResponse({'error': 'card not found'}, status_code=404)
+    async def get_card(
+        card_id: UUID,
+        session: AsyncSession = Depends(get_session),
+        user_id: str = Depends(login_manager),
+    ):
+        card = await session.get(Card, card_id)
+        if card and card.user_id == user_id:
+            return JSONResponse(card.to_dict())
+        else:
+            return JSONResponse({'error': 'card not found'}, status_code=404)
 
     @app.post('/card')
-    @token_required
-    @required_fields('title', 'category_id', 'status')
-    async def create_card(request: Request):
-        with Session() as session:
-            body = await request.json()
-            query = select(User).where(User.id == body['user_id'])
-            user = session.scalars(query).first()
-            category = session.get(CardCategory, body['category_id'])
-            if category is None:
-                return JSONResponse({'error': 'invalid category_id'}, status_code=400)
-            card = Card(
-                status=body['status'],
-                title=body['title'],
-                description=body.get('description'),
-                category_id=category.id,
-                id=str(uuid4()),
-                user_id=user.id,
+    async def create_card(
+        payload: CardIn,
+        session: AsyncSession = Depends(get_session),
+        user_id: str = Depends(login_manager),
+    ):
+        if not await owns_category(session, payload.category_id, user_id):
+            return JSONResponse(
+                {'error': 'invalid category_id'}, status_code=400
             )
-            session.add(card)
-            session.commit()
-            session.flush()
-            return JSONResponse(card.to_dict())
+        card = Card(
+            status=payload.status,
+            title=payload.title,
+            description=payload.description,
+            category_id=payload.category_id,
+            user_id=user_id,
+        )
+        session.add(card)
+        await session.commit()
+        return JSONResponse(card.to_dict())
 
     @app.put('/card')
-    @token_required
-    @required_fields('id', 'status', 'title', 'category_id')
-    async def update_card(request: Request):
-        with Session() as session:
-            body = await request.json()
-            card = session.get(Card, body['id'])
-            if card:
-                card.status = body['status']
-                card.title = body['title']
-                card.description = body.get('description')
-                card.update_at = datetime.now()
-                card.category_id = body['category_id']
-                session.commit()
-                session.flush()
-                return JSONResponse(card.to_dict())
-            else:
-                return JSONResponse({'error': 'card not found'}, status_code=404)
+    async def update_card(
+        payload: CardUpdateIn,
+        session: AsyncSession = Depends(get_session),
+        user_id: str = Depends(login_manager),
+    ):
+        if not await owns_category(session, payload.category_id, user_id):
+            return JSONResponse(
+                {'error': 'invalid category_id'}, status_code=400
+            )
+        query = (
+            update(Card)
+            .where(Card.id == payload.id, Card.user_id == user_id)
+            .values(
+                status=payload.status,
+                title=payload.title,
+                description=payload.description,
+                category_id=payload.category_id,
+            )
+            .returning(Card)
+        )
+        card = (await session.execute(query)).scalar_one_or_none()
+        if card:
+            await session.commit()
+            return JSONResponse(card.to_dict())
+        else:
+            return JSONResponse({'error': 'card not found'}, status_code=404)
 
     @app.delete('/card')
-    @token_required
-    @required_fields('id')
-    async def delete_card(request: Request):
-        with Session() as session:
-            body = await request.json()
-            card = session.get(Card, body['id'])
-            if card is None:
-                return JSONResponse({'error': 'card not found'}, status_code=404)
-            session.delete(card)
-            session.commit()
-            session.flush()
-            return JSONResponse(card.to_dict())
+    async def delete_card(
+        payload: CardDeleteIn,
+        session: AsyncSession = Depends(get_session),
+        user_id: str = Depends(login_manager),
+    ):
+        query = (
+            delete(Card)
+            .where(Card.id == payload.id, Card.user_id == user_id)
+            .returning(Card)
+        )
+        card = (await session.execute(query)).scalar_one_or_none()
+        if card is None:
+            return JSONResponse({'error': 'card not found'}, status_code=404)
+        await session.commit()
+        return JSONResponse(card.to_dict())
 
     @app.get('/card-category')
-    @token_required
-    async def get_cards_categories(request: Request):
-        with Session() as session:
-            body = await request.json()
-            query = select(User).where(User.id == body['user_id'])
-            user = session.scalars(query).first()
-            query = select(CardCategory).where(CardCategory.user_id == user.id)
-            cards_categories = [
-                card_category.to_dict()
-                for card_category in session.scalars(query).all()
-            ]
-            return JSONResponse(cards_categories)
+    async def get_cards_categories(
+        session: AsyncSession = Depends(get_session),
+        user_id: str = Depends(login_manager),
+    ):
+        card_id = (
+            select(Card.id)
+            .where(Card.category_id == CardCategory.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        query = select(
+            CardCategory.id,
+            CardCategory.name,
+            CardCategory.color,
+            CardCategory.create_at,
+            CardCategory.update_at,
+            card_id.label('card_id'),
+        ).where(CardCategory.user_id == user_id)
+        return await rows_response(session, query, CardCategoryOut)
 
     @app.get('/card-category/{card_category_id}')
-    @token_required
-    async def get_card_category(request: Request, card_category_id: str):
-        with Session() as session:
-            body = await request.json()
-            query = select(User).where(User.id == body['user_id'])
-            user = session.scalars(query).first()
-            card_category = session.get(CardCategory, card_category_id)
-            if card_category and card_category.user_id == user.id:
-                return JSONResponse(card_category.to_dict())
-            else:
-                return JSONResponse({'error': 'card category not found'}, status_code=404)
+    async def get_card_category(
+        card_category_id: UUID,
+        session: AsyncSession = Depends(get_session),
+        user_id: str = Depends(login_manager),
+    ):
+        card_category = await session.get(CardCategory, card_category_id)
+        if card_category and card_category.user_id == user_id:
+            return JSONResponse(card_category.to_dict())
+        else:
+            return JSONResponse(
+                {'error': 'card category not found'}, status_code=404
+            )
 
     @app.post('/card-category')
-    @token_required
-    @required_fields('name', 'color')
-    async def create_card_category(request: Request):
-        with Session() as session:
-            body = await request.json()
-            query = select(User).where(User.id == body['user_id'])
-            user = session.scalars(query).first()
-            card_category = CardCategory(
-                name=body['name'],
-                color=body['color'], 
-                user_id=user.id,
-                id=str(uuid4())
-            )
-            session.add(card_category)
-            session.commit()
-            session.flush()
-            return JSONResponse(card_category.to_dict())
+    async def create_card_category(
+        payload: CardCategoryIn,
+        session: AsyncSession = Depends(get_session),
+        user_id: str = Depends(login_manager),
+    ):
+        card_category = CardCategory(
+            name=payload.name,
+            color=payload.color,
+            user_id=user_id,
+            card=None,
+        )
+        session.add(card_category)
+        await session.commit()
+        return JSONResponse(card_category.to_dict())
 
     @app.put('/card-category')
-    @token_required
-    @required_fields('category_id', 'name', 'color')
-    async def update_card_category(request: Request):
-        with Session() as session:
-            body = await request.json()
-            card_category = session.get(CardCategory, body['category_id'])
-            if card_category:
-                card_category.name = body['name']
-                card_category.color = body['color']
-                card_category.update_at = datetime.now()
-                session.commit()
-                session.flush()
-                return JSONResponse(card_category.to_dict())
-            else:
-                return JSONResponse({'error': 'card category not found'}, status_code=404)
+    async def update_card_category(
+        payload: CardCategoryUpdateIn,
+        session: AsyncSession = Depends(get_session),
+        user_id: str = Depends(login_manager),
+    ):
+        query = (
+            update(CardCategory)
+            .where(
+                CardCategory.id == payload.category_id,
+                CardCategory.user_id == user_id,
+            )
+            .values(
+                name=payload.name,
+                color=payload.color,
+            )
+            .returning(CardCategory)
+        )
+        card_category = (await session.execute(query)).scalar_one_or_none()
+        if card_category:
+            await card_category.awaitable_attrs.card
+            await session.commit()
+            return JSONResponse(card_category.to_dict())
+        else:
+            return JSONResponse(
+                {'error': 'card category not found'}, status_code=404
+            )
 
     @app.delete('/card-category')
-    @token_required
-    @required_fields('category_id')
-    async def delete_card_category(request: Request):
-        with Session() as session:
-            body = await request.json()
-            card_category = session.get(CardCategory, body['category_id'])
-            if card_category is None:
-                return JSONResponse({'error': 'card category not found'}, status_code=404)
-            session.delete(card_category)
-            session.commit()
-            session.flush()
-            return JSONResponse(card_category.to_dict())
\ No newline at end of file
+    async def delete_card_category(
+        payload: CardCategoryDeleteIn,
+        session: AsyncSession = Depends(get_session),
+        user_id: str = Depends(login_manager),
+    ):
+        card_category = await session.get(CardCategory, payload.category_id)
+        if card_category is None or card_category.user_id != user_id:
+            return JSONResponse(
+                {'error': 'card category not found'}, status_code=404
+            )
+        await session.delete(card_category)
+        await session.commit()
+        return JSONResponse(card_category.to_dict())